@@ -0,0 +1,259 @@
+"""
+Numba-compiled bounding box kernels.
+
+This module provides the scalar box geometry used by the merge and
+deduplication helpers in utils.py, compiled to native code with Numba.
+Boxes are float64 arrays of [x_min, y_min, x_max, y_max].
+"""
+
+import numpy as np
+from numba import njit, prange
+
+
+@njit('f8(f8, f8)', cache=True, fastmath=True, nogil=True)
+def _min(a: float, b: float) -> float:
+    return a if a < b else b
+
+
+@njit('f8(f8, f8)', cache=True, fastmath=True, nogil=True)
+def _max(a: float, b: float) -> float:
+    return a if a > b else b
+
+
+@njit('b1(f8[:], f8[:], f8)', cache=True, fastmath=True, nogil=True)
+def _close(box1: np.ndarray, box2: np.ndarray, squared_threshold: float) -> bool:
+    """Check if two boxes overlap or are within sqrt(squared_threshold) of each other."""
+    # Gap between the boxes along each axis (negative values are overlap)
+    x_gap = _max(box1[0], box2[0]) - _min(box1[2], box2[2])
+    if x_gap > 0 and x_gap * x_gap > squared_threshold:
+        return False
+
+    y_gap = _max(box1[1], box2[1]) - _min(box1[3], box2[3])
+    if y_gap > 0 and y_gap * y_gap > squared_threshold:
+        return False
+
+    # Return True if boxes already overlap
+    if x_gap < 0 and y_gap < 0:
+        return True
+
+    # Horizontal and vertical distance (0 when the projections touch)
+    x_distance = _max(0.0, x_gap)
+    y_distance = _max(0.0, y_gap)
+
+    # Consider boxes close if diagonal distance is below threshold
+    return x_distance * x_distance + y_distance * y_distance <= squared_threshold
+
+
+@njit('f8(f8[:], f8[:], f8, f8)', cache=True, fastmath=True, nogil=True)
+def _iou(box1: np.ndarray, box2: np.ndarray, area1: float, area2: float) -> float:
+    """IoU of two boxes whose areas are already known."""
+    x_left = _max(box1[0], box2[0])
+    y_top = _max(box1[1], box2[1])
+    x_right = _min(box1[2], box2[2])
+    y_bottom = _min(box1[3], box2[3])
+
+    if x_right < x_left or y_bottom < y_top:
+        return 0.0
+
+    intersection = (x_right - x_left) * (y_bottom - y_top)
+    union = area1 + area2 - intersection
+
+    return intersection / union if union > 0 else 0.0
+
+
+@njit(cache=True, fastmath=True, nogil=True)
+def suppress_boxes(coords: np.ndarray, areas: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """
+    Greedy non-maximum suppression over boxes sorted by descending area.
+
+    Args:
+        coords: (N, 4) float64 array of [x_min, y_min, x_max, y_max], largest first
+        areas: (N,) float64 array of box areas, in the same order
+        iou_threshold: IoU above which a later box is a duplicate
+
+    Returns:
+        (N,) boolean keep mask
+    """
+    n = coords.shape[0]
+    keep = np.ones(n, dtype=np.bool_)
+
+    for i in range(n):
+        if not keep[i]:
+            continue
+
+        # IoU is at most the ratio of the smaller area to the larger one, so
+        # once later boxes are small enough none of them can be a duplicate
+        min_area = areas[i] * iou_threshold
+        for j in range(i + 1, n):
+            if areas[j] <= min_area:
+                break
+            if keep[j] and _iou(coords[i], coords[j], areas[i], areas[j]) > iou_threshold:
+                keep[j] = False
+
+    return keep
+
+
+@njit(cache=True, fastmath=True, nogil=True, parallel=True)
+def iou_pairs(coords: np.ndarray, areas: np.ndarray, iou_threshold: float):
+    """
+    Find every pair of boxes whose IoU is above the threshold, one thread per row.
+
+    Each row is scanned twice, once to count its pairs and once to write them
+    at that row's offset, so threads never share output slots.
+
+    Args:
+        coords: (N, 4) float64 array of [x_min, y_min, x_max, y_max], largest first
+        areas: (N,) float64 array of box areas, in the same order
+        iou_threshold: IoU above which two boxes are duplicates
+
+    Returns:
+        Tuple of (first, second) index arrays with first < second for each pair
+    """
+    n = coords.shape[0]
+    counts = np.zeros(n, dtype=np.int64)
+
+    for i in prange(n):
+        # Later boxes are smaller, so stop once IoU can no longer reach the threshold
+        min_area = areas[i] * iou_threshold
+        count = 0
+        for j in range(i + 1, n):
+            if areas[j] <= min_area:
+                break
+            if _iou(coords[i], coords[j], areas[i], areas[j]) > iou_threshold:
+                count += 1
+        counts[i] = count
+
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(counts)
+    first = np.empty(offsets[n], dtype=np.int64)
+    second = np.empty(offsets[n], dtype=np.int64)
+
+    for i in prange(n):
+        min_area = areas[i] * iou_threshold
+        k = offsets[i]
+        for j in range(i + 1, n):
+            if areas[j] <= min_area:
+                break
+            if _iou(coords[i], coords[j], areas[i], areas[j]) > iou_threshold:
+                first[k] = i
+                second[k] = j
+                k += 1
+
+    return first, second
+
+
+@njit(cache=True, fastmath=True, nogil=True)
+def merge_boxes(boxes: np.ndarray, distance_threshold: float) -> np.ndarray:
+    """
+    Merge overlapping or nearby boxes in a single greedy pass.
+
+    Each box that is not merged yet, in input order, grows by absorbing
+    every remaining box that is close to it until nothing else is close.
+    The resulting boxes are not merged with each other again.
+
+    Args:
+        boxes: (N, 4) float64 array of [x_min, y_min, x_max, y_max]
+        distance_threshold: Maximum distance to consider boxes for merging
+
+    Returns:
+        (M, 4) float64 array of merged boxes
+    """
+    n = boxes.shape[0]
+    merged = np.empty((n, 4), dtype=np.float64)
+    count = 0
+    squared_threshold = distance_threshold * distance_threshold
+
+    # Boxes that have not been merged yet, in their original order. Every scan
+    # compacts the absorbed boxes out, so later scans only visit what is left.
+    remaining = np.arange(n)
+    size = n
+
+    while size > 0:
+        current_box = boxes[remaining[0]].copy()
+        start = 1
+        merged_any = True
+
+        # Keep merging until no more boxes can be merged
+        while merged_any:
+            merged_any = False
+            kept = 0
+            for k in range(start, size):
+                j = remaining[k]
+                if _close(current_box, boxes[j], squared_threshold):
+                    # Create minimum bounding box that contains both boxes
+                    current_box[0] = _min(current_box[0], boxes[j, 0])
+                    current_box[1] = _min(current_box[1], boxes[j, 1])
+                    current_box[2] = _max(current_box[2], boxes[j, 2])
+                    current_box[3] = _max(current_box[3], boxes[j, 3])
+                    merged_any = True
+                else:
+                    remaining[kept] = j
+                    kept += 1
+            size = kept
+            start = 0
+
+        merged[count] = current_box
+        count += 1
+
+    return merged[:count]
+
+
+@njit(cache=True, nogil=True)
+def _find(parent: np.ndarray, i: int) -> int:
+    """Return the root of i, pointing every node on the way directly at it."""
+    root = i
+    while parent[root] != root:
+        root = parent[root]
+
+    while parent[i] != root:
+        next_i = parent[i]
+        parent[i] = root
+        i = next_i
+
+    return root
+
+
+@njit(cache=True, nogil=True)
+def union_find(n: int, first: np.ndarray, second: np.ndarray):
+    """
+    Group n nodes into connected components with union-find.
+
+    Uses path compression and union by rank, so each edge costs amortized
+    near-constant time.
+
+    Args:
+        n: Number of nodes
+        first: (E,) array with one endpoint of each edge
+        second: (E,) array with the other endpoint of each edge
+
+    Returns:
+        Tuple of (component count, (n,) component label of each node), with
+        components numbered in order of their lowest node
+    """
+    parent = np.arange(n)
+    rank = np.zeros(n, dtype=np.int64)
+
+    for k in range(first.shape[0]):
+        a = _find(parent, first[k])
+        b = _find(parent, second[k])
+        if a == b:
+            continue
+
+        # Hang the shallower tree under the deeper one
+        if rank[a] < rank[b]:
+            a, b = b, a
+        parent[b] = a
+        if rank[a] == rank[b]:
+            rank[a] += 1
+
+    labels = np.empty(n, dtype=np.int64)
+    root_label = np.full(n, -1, dtype=np.int64)
+    count = 0
+    for i in range(n):
+        root = _find(parent, i)
+        if root_label[root] < 0:
+            root_label[root] = count
+            count += 1
+        labels[i] = root_label[root]
+
+    return count, labels
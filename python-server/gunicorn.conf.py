@@ -0,0 +1,20 @@
+"""
+Gunicorn configuration for the OCR server.
+
+Run from the python-server directory with: gunicorn server:app
+
+A single worker holds the models; its threads overlap request decoding,
+preprocessing and translation while GPU work is serialized in server.py.
+"""
+
+bind = "127.0.0.1:5000"
+workers = 1
+worker_class = "gthread"
+threads = 4
+
+# The worker loads the models itself: CUDA and Metal can't be used in a
+# process forked after they were initialized, so the master must not import server.py
+preload_app = False
+
+# Large pages with many bubbles can take a while on CPU
+timeout = 300
@@ -7,14 +7,25 @@ and optional translation using LM Studio or OpenAI API.
 
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import base64
-from io import BytesIO
+import importlib.util
+import itertools
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Any, List, Union
+import numpy as np
 from PIL import Image
 import torch
 import gc
-from transformers import AutoModelForCausalLM, AutoProcessor
+from torch.nn.attention import SDPBackend, sdpa_kernel
+from transformers import AutoModelForCausalLM, AutoProcessor, BatchFeature, BitsAndBytesConfig
 from surya.detection import DetectionPredictor
-from utils import merge_overlapping_boxes, image_enhance, translate_text
+from utils import (
+    BoxBatch, merge_overlapping_boxes, image_enhance, decode_image, translate_texts,
+    bucket_size, crop_region, crop_to_bucket, image_hash, ocr_cache
+)
 
 app = Flask(__name__)
 CORS(app)
@@ -40,12 +51,77 @@ det_predictor = DetectionPredictor()
 
 dotsocr_model_path = "weights/DotsOCR"
 
+# Weight quantization: nf4, int8 or none
+QUANT = os.environ.get('QUANT', 'none').lower()
+if QUANT not in ('none', 'nf4', 'int8'):
+    raise ValueError(f'Unsupported QUANT value: {QUANT} (expected nf4, int8 or none)')
+
+if QUANT != 'none' and device == 'mps':
+    print('⚠️  bitsandbytes does not support MPS - loading without quantization')
+    QUANT = 'none'
+
+model_kwargs = {}
+if QUANT != 'none' and device == 'cuda':
+    # bitsandbytes: weights are quantized on load and placed on the GPU directly
+    if QUANT == 'nf4':
+        quantization_config = BitsAndBytesConfig(
+            load_in_4bit=True,
+            bnb_4bit_compute_dtype=torch.bfloat16,
+            bnb_4bit_quant_type="nf4"
+        )
+    else:
+        quantization_config = BitsAndBytesConfig(load_in_8bit=True)
+    model_kwargs = {'quantization_config': quantization_config, 'device_map': {'': 0}}
+
+# Fused attention kernels: FlashAttention-2 when installed on CUDA, PyTorch SDPA otherwise
+if device == 'cuda' and importlib.util.find_spec('flash_attn') is not None:
+    attn_implementation = "flash_attention_2"
+else:
+    attn_implementation = "sdpa"
+print(f'✓ Attention implementation: {attn_implementation}')
+
 model = AutoModelForCausalLM.from_pretrained(
     dotsocr_model_path,
     torch_dtype=dtype,
     trust_remote_code=True,
-    local_files_only=True
-).to(device)
+    local_files_only=True,
+    attn_implementation=attn_implementation,
+    **model_kwargs
+)
+
+if 'quantization_config' not in model_kwargs:
+    model = model.to(device)
+
+if QUANT != 'none' and device == 'cpu':
+    # No bitsandbytes kernels on CPU, use dynamic int8 quantization of the Linear layers instead
+    model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+if QUANT != 'none':
+    print(f'✓ DotsOCR weights quantized ({QUANT} on {device})')
+
+# Intel Extension for PyTorch: BF16 kernels (AVX-512 BF16 / AMX) for the CPU path
+USE_IPEX = False
+if device == 'cpu' and QUANT == 'none':
+    try:
+        import intel_extension_for_pytorch as ipex
+    except ImportError:
+        ipex = None
+
+    if ipex is not None:
+        try:
+            model = ipex.llm.optimize(model.eval(), dtype=torch.bfloat16, inplace=True)
+            USE_IPEX = True
+        except Exception as e:
+            # ipex.llm only knows a fixed set of architectures; fall back to the generic optimizer
+            print(f'⚠️  ipex.llm.optimize failed ({e}) - using ipex.optimize')
+            try:
+                model = ipex.optimize(model.eval(), dtype=torch.bfloat16, inplace=True)
+                USE_IPEX = True
+            except Exception as e:
+                print(f'⚠️  ipex.optimize failed ({e}) - keeping the plain PyTorch model')
+
+    if USE_IPEX:
+        print('✓ DotsOCR optimized with IPEX (bf16)')
 
 processor = AutoProcessor.from_pretrained(
     dotsocr_model_path,
@@ -53,10 +129,290 @@ processor = AutoProcessor.from_pretrained(
     local_files_only=True
 )
 
+# Compile the hot modules with TorchInductor. Off by default because the first
+# compilation adds noticeable startup time during development
+TORCH_COMPILE = os.environ.get('TORCH_COMPILE', '0') == '1'
+
+if TORCH_COMPILE:
+    print('⚙️  Compiling models with torch.compile...')
+    # generate() calls self.forward, so compile the bound forward rather than
+    # wrapping the module (a wrapped module would still decode uncompiled)
+    model.forward = torch.compile(model.forward, mode="reduce-overhead", fullgraph=False, dynamic=True)
+    det_predictor.model = torch.compile(det_predictor.model, mode="reduce-overhead", dynamic=True)
+
+# Decoder-only generation needs left padding so every prompt in a batch ends
+# right where generation starts
+processor.tokenizer.padding_side = 'left'
+
 print('✓ Models ready')
 
 PROMPT = """Extract the text content from this image."""
 
+# The chat template only depends on the prompt, so render it once at startup
+TEMPLATED_TEXT = processor.apply_chat_template(
+    [
+        {
+            "role": "user",
+            "content": [
+                {"type": "image"},
+                {"type": "text", "text": PROMPT}
+            ]
+        }
+    ],
+    tokenize=False,
+    add_generation_prompt=True
+)
+
+# Stop each bubble as soon as it emits an end token instead of decoding all
+# max_new_tokens. Keep the model's own end-of-turn ids next to the tokenizer's EOS.
+generation_eos = model.generation_config.eos_token_id
+EOS_TOKEN_IDS = sorted(
+    ({processor.tokenizer.eos_token_id}
+     | set(generation_eos if isinstance(generation_eos, list) else [generation_eos]))
+    - {None}
+)
+PAD_TOKEN_ID = processor.tokenizer.pad_token_id if processor.tokenizer.pad_token_id is not None else EOS_TOKEN_IDS[0]
+
+# A static KV cache gives torch.compile fixed shapes to capture
+if TORCH_COMPILE and getattr(model, '_supports_static_cache', False):
+    model.generation_config.cache_implementation = "static"
+
+# Serializes GPU work (detection and generation) across request threads, while
+# decoding, preprocessing and translation of other requests keep running
+gpu_lock = threading.Lock()
+
+# Maximum number of bubbles sent through a single generate() call (caps VRAM)
+OCR_BATCH = int(os.environ.get('OCR_BATCH', '8'))
+
+# Prepared batches waiting for the GPU (each one holds device memory)
+PREFETCH_BATCHES = 2
+
+# Side stream for host-to-device copies of the next batch, and the worker
+# threads that prepare those batches while the GPU decodes
+copy_stream = torch.cuda.Stream() if device == 'cuda' else None
+prepare_pool = ThreadPoolExecutor(max_workers=4)
+
+
+# Cached GPU memory is only handed back under pressure: on CUDA when less than
+# this fraction is free, on MPS (which can't report free memory) every N requests
+FREE_MEMORY_THRESHOLD = 0.2
+MPS_EMPTY_CACHE_EVERY = 50
+request_counter = itertools.count(1)
+
+
+def release_memory_if_needed() -> None:
+    """Empty the allocator cache only when memory is running low."""
+    if device == 'cuda':
+        free, total = torch.cuda.mem_get_info()
+        if free / total < FREE_MEMORY_THRESHOLD:
+            print(f'🧹 Low GPU memory ({free / total:.0%} free), releasing cached blocks')
+            gc.collect()
+            torch.cuda.empty_cache()
+    elif device == 'mps' and next(request_counter) % MPS_EMPTY_CACHE_EVERY == 0:
+        gc.collect()
+        torch.mps.empty_cache()
+
+
+def attention_backends():
+    """Restrict SDPA to the flash and memory-efficient kernels on CUDA."""
+    if device == 'cuda':
+        return sdpa_kernel([SDPBackend.FLASH_ATTENTION, SDPBackend.EFFICIENT_ATTENTION])
+    # MPS and CPU keep PyTorch's default backend selection
+    return nullcontext()
+
+
+def cpu_autocast():
+    """Run CPU generation in bfloat16 when the model was optimized with IPEX."""
+    if USE_IPEX:
+        return torch.autocast('cpu', dtype=torch.bfloat16)
+    return nullcontext()
+
+
+def to_device(inputs: BatchFeature) -> BatchFeature:
+    """
+    Move processor outputs to the model device in one call.
+
+    Floating point tensors are cast to the model dtype, integer tensors
+    (token ids, masks, grid sizes) only change device.
+
+    Args:
+        inputs: BatchFeature returned by the processor
+
+    Returns:
+        BatchFeature on the model device
+    """
+    if device == 'cuda':
+        # Copies from pinned host memory run asynchronously with GPU work
+        inputs = BatchFeature({
+            k: v.pin_memory() if isinstance(v, torch.Tensor) else v
+            for k, v in inputs.items()
+        })
+    return inputs.to(device, dtype=dtype, non_blocking=True)
+
+
+def prepare_ocr_inputs(crops: List[Union[Image.Image, np.ndarray]]) -> BatchFeature:
+    """
+    Preprocess a batch of crops and start copying it to the device.
+
+    On CUDA the copy runs on a side stream so it can overlap with a
+    generate() call that is already running.
+
+    Args:
+        crops: Cropped PIL Images or (H, W, 3) uint8 arrays
+
+    Returns:
+        BatchFeature on the model device
+    """
+    inputs = processor(text=[TEMPLATED_TEXT] * len(crops), images=crops, padding=True, return_tensors="pt")
+
+    if copy_stream is None:
+        return to_device(inputs)
+
+    with torch.cuda.stream(copy_stream):
+        inputs = to_device(inputs)
+    inputs['copy_done'] = copy_stream.record_event()
+    return inputs
+
+
+def generate_ocr_text(inputs: BatchFeature) -> List[str]:
+    """
+    Run DotsOCR on prepared inputs with a single generate() call.
+
+    Args:
+        inputs: BatchFeature from prepare_ocr_inputs()
+
+    Returns:
+        List of recognized texts, in batch order
+    """
+    copy_done = inputs.pop('copy_done', None)
+
+    with gpu_lock, torch.inference_mode(), attention_backends(), cpu_autocast():
+        if copy_done is not None:
+            # Wait for the side-stream copy, and keep its memory alive for this stream
+            compute_stream = torch.cuda.current_stream()
+            compute_stream.wait_event(copy_done)
+            for v in inputs.values():
+                if isinstance(v, torch.Tensor):
+                    v.record_stream(compute_stream)
+
+        generated_ids = model.generate(
+            **inputs,
+            max_new_tokens=64,
+            do_sample=False,
+            num_beams=1,
+            use_cache=True,
+            eos_token_id=EOS_TOKEN_IDS,
+            pad_token_id=PAD_TOKEN_ID,
+        )
+
+    # Prompts are left-padded to the same length, so the new tokens start at a shared offset
+    generated_ids_trimmed = generated_ids[:, inputs['input_ids'].shape[1]:]
+
+    output_texts = processor.batch_decode(
+        generated_ids_trimmed,
+        skip_special_tokens=True,
+        clean_up_tokenization_spaces=False
+    )
+
+    # Clean up tensors only (keep models)
+    del inputs, generated_ids, generated_ids_trimmed
+
+    return output_texts
+
+
+def ocr_batch(crops: List[Union[Image.Image, np.ndarray]]) -> List[str]:
+    """
+    Run DotsOCR on a batch of cropped bubbles with a single generate() call.
+
+    Args:
+        crops: Cropped PIL Images or (H, W, 3) uint8 arrays
+
+    Returns:
+        List of recognized texts, in the same order as crops
+    """
+    return generate_ocr_text(prepare_ocr_inputs(crops))
+
+
+def prepare_ocr_batches(
+    image: Image.Image,
+    bboxes: List[List[float]],
+    ocr_texts: List[str],
+    crop_hashes: List[str],
+    batches: queue.Queue,
+    stop: threading.Event
+) -> None:
+    """
+    Producer for the OCR loop: crop, hash and preprocess bubbles in batches.
+
+    Cached bubbles are written straight into ocr_texts; the rest are queued
+    as (indices, inputs) batches, followed by None once everything is queued.
+
+    Args:
+        image: Enhanced page image
+        bboxes: Bubble boxes in [x_min, y_min, x_max, y_max] format
+        ocr_texts: Output list, filled in for cache hits
+        crop_hashes: Output list, filled with each crop's hash
+        batches: Queue the prepared batches are put on
+        stop: Set by the consumer when it gives up, so the producer exits
+    """
+    def put(item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        # Compiled graphs only stay hot for a few input shapes, so pad crops to
+        # buckets and visit them bucket by bucket. Uncompiled, padding would just
+        # add vision tokens, since the processor sizes each image by its pixels.
+        if TORCH_COMPILE:
+            order = sorted(
+                range(len(bboxes)),
+                key=lambda i: bucket_size(int(bboxes[i][2]) - int(bboxes[i][0]), int(bboxes[i][3]) - int(bboxes[i][1]))
+            )
+            crop = crop_to_bucket
+        else:
+            order = range(len(bboxes))
+            crop = crop_region
+
+        # Crops are sliced from one array instead of going through PIL per bubble
+        page = np.asarray(image)
+
+        batch, crops = [], []
+        for idx in order:
+            cropped = crop(page, bboxes[idx])
+            crop_hashes[idx] = image_hash(cropped)
+
+            # Reuse text for bubbles that were already recognized
+            cached = ocr_cache.get(crop_hashes[idx])
+            if cached is not None:
+                ocr_texts[idx] = cached
+                continue
+
+            batch.append(idx)
+            crops.append(cropped)
+            if len(batch) == OCR_BATCH:
+                if not put((batch, prepare_ocr_inputs(crops))):
+                    return
+                batch, crops = [], []
+
+        if batch and not put((batch, prepare_ocr_inputs(crops))):
+            return
+    finally:
+        put(None)
+
+
+if TORCH_COMPILE:
+    # Trigger compilation now so the first real request doesn't pay for it
+    print('⚙️  Warming up compiled models...')
+    warmup_image = Image.new('RGB', (256, 256), 'white')
+    det_predictor([warmup_image])
+    ocr_batch([warmup_image])
+    print('✓ Warm-up done')
+
 
 @app.route('/ocr', methods=['POST'])
 def ocr_endpoint():
@@ -82,95 +438,69 @@ def ocr_endpoint():
         if not image_data_url:
             return jsonify({'error': 'No image'}), 400
 
-        if ',' in image_data_url:
-            image_data_url = image_data_url.split(',', 1)[1]
-
-        image_bytes = base64.b64decode(image_data_url)
-        image = Image.open(BytesIO(image_bytes))
-
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-
-        image = image_enhance(image)
+        image = image_enhance(decode_image(image_data_url))
 
         print(f'Processing: {image.size}')
 
         # Step 1: Detect text bubbles with Surya
         print('🔍 Detecting text bubbles with Surya...')
-        predictions = det_predictor([image])
-        text_bboxes = merge_overlapping_boxes(predictions[0].bboxes, 10)
+        with gpu_lock:
+            predictions = det_predictor([image])
+        bubbles = merge_overlapping_boxes(BoxBatch.from_objects(predictions[0].bboxes), 10)
 
         # Filter out small bubbles
         MIN_WIDTH = 30
         MIN_HEIGHT = 30
         MIN_AREA = 900
 
-        filtered_bboxes = []
-        for bbox in text_bboxes:
-            x1, y1, x2, y2 = bbox
-            width = x2 - x1
-            height = y2 - y1
-            area = width * height
-
-            if width >= MIN_WIDTH and height >= MIN_HEIGHT and area >= MIN_AREA:
-                filtered_bboxes.append(bbox)
-
-        text_bboxes = filtered_bboxes
+        widths = bubbles.coords[:, 2] - bubbles.coords[:, 0]
+        heights = bubbles.coords[:, 3] - bubbles.coords[:, 1]
+        keep = (widths >= MIN_WIDTH) & (heights >= MIN_HEIGHT) & (widths * heights >= MIN_AREA)
+        text_bboxes = bubbles[keep].coords.tolist()
         print(f'✓ Detected {len(text_bboxes)} text bubbles')
 
-        # Step 2: Perform OCR on each bubble
+        # Step 2: Perform OCR on all bubbles in batches, with a worker thread
+        # preparing the next batch while the GPU decodes the current one
+        ocr_texts = [''] * len(text_bboxes)
+        crop_hashes = [''] * len(text_bboxes)
+        batches = queue.Queue(maxsize=PREFETCH_BATCHES)
+        stop = threading.Event()
+        producer = prepare_pool.submit(
+            prepare_ocr_batches, image, text_bboxes, ocr_texts, crop_hashes, batches, stop
+        )
+
+        recognized = 0
+        try:
+            while True:
+                item = batches.get()
+                if item is None:
+                    break
+
+                batch, inputs = item
+                print(f'🔄 OCR {recognized + 1}-{recognized + len(batch)}')
+                for idx, output_text in zip(batch, generate_ocr_text(inputs)):
+                    ocr_texts[idx] = output_text
+                    ocr_cache.put(crop_hashes[idx], output_text)
+                recognized += len(batch)
+        finally:
+            stop.set()
+
+        # Re-raise anything that went wrong while preparing batches
+        producer.result()
+
+        if recognized < len(text_bboxes):
+            print(f'✓ {len(text_bboxes) - recognized} bubbles served from OCR cache')
+
+        # Step 3: Translate the recognized text concurrently
+        print(f'🌐 Translating {len(ocr_texts)} texts to {target_lang}...')
+        translations = translate_texts(ocr_texts, target_lang=target_lang)
+
         text_blocks = []
 
-        for idx, bbox in enumerate(text_bboxes):
+        for idx, (bbox, output_text, translated_text) in enumerate(zip(text_bboxes, ocr_texts, translations)):
             x1, y1, x2, y2 = map(int, bbox)
-            cropped = image.crop((x1, y1, x2, y2))
-
-            print(f'🔄 OCR {idx + 1}/{len(text_bboxes)} at ({x1}, {y1}, {x2}, {y2})')
-
-            messages = [
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "image", "image": cropped},
-                        {"type": "text", "text": PROMPT}
-                    ]
-                }
-            ]
-
-            text = processor.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
-            inputs = processor(text=[text], images=[cropped], padding=True, return_tensors="pt")
-
-            # Move inputs to device with appropriate dtype
-            inputs = {
-                k: v.to(device).to(dtype) if isinstance(v, torch.Tensor) and v.dtype in [torch.float32, torch.bfloat16, torch.float16]
-                else v.to(device) if isinstance(v, torch.Tensor)
-                else v
-                for k, v in inputs.items()
-            }
-
-            with torch.no_grad():
-                generated_ids = model.generate(
-                    **inputs,
-                    max_new_tokens=64,
-                    do_sample=False,
-                    num_beams=1,
-                )
-
-            generated_ids_trimmed = [
-                out_ids[len(in_ids):] for in_ids, out_ids in zip(inputs['input_ids'], generated_ids)
-            ]
 
-            output_text = processor.batch_decode(
-                generated_ids_trimmed,
-                skip_special_tokens=True,
-                clean_up_tokenization_spaces=False
-            )[0]
-
-            print(f'   Text: {output_text}')
-
-            # Perform translation with selected target language
-            print(f'🌐 Translating to {target_lang}...')
-            translated_text = translate_text(output_text, target_lang=target_lang)
+            print(f'   Text {idx + 1} at ({x1}, {y1}, {x2}, {y2}): {output_text}')
             print(f'   Translated: {translated_text}')
 
             # Use original text if translation fails
@@ -192,15 +522,7 @@ def ocr_endpoint():
                 'style': 'normal'
             })
 
-            # Clean up tensors only (keep models)
-            del inputs, generated_ids, generated_ids_trimmed
-
-        # Clean up memory after processing all requests
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
-        elif torch.backends.mps.is_available():
-            torch.mps.empty_cache()
-        gc.collect()
+        release_memory_if_needed()
 
         full_text = '\n'.join([b['text'] for b in text_blocks])  # Now contains translated text
 
@@ -229,5 +551,7 @@ def health():
 
 
 if __name__ == '__main__':
+    # Development server; use `gunicorn server:app` (see gunicorn.conf.py) in production.
+    # Debug mode's reloader loads the models a second time, so it is opt-in.
     print('Starting server on http://localhost:5000')
-    app.run(host='localhost', port=5000, debug=True)
+    app.run(host='localhost', port=5000, debug=os.environ.get('FLASK_DEBUG') == '1', threaded=True)
@@ -5,9 +5,30 @@ This module provides helper functions for image processing, bounding box operati
 and text translation using OpenAI API or LM Studio.
 """
 
-from typing import List, Dict, Optional, Tuple, Any
-from PIL import Image, ImageEnhance
+import logging
+import os
+import threading
+from io import BytesIO
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Dict, Optional, Tuple, Any, Hashable, Union
+import cv2
+import numpy as np
+import pybase64
+import xxhash
+from PIL import Image
 from openai import OpenAI
+from _fast import iou_pairs, merge_boxes, suppress_boxes, union_find
+
+# libjpeg-turbo is optional: PyTurboJPEG also needs the native library installed
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB
+    _turbo_jpeg = TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    _turbo_jpeg = None
+
+logger = logging.getLogger(__name__)
 
 # Type aliases for better code readability
 BoundingBox = Tuple[float, float, float, float]  # (x_min, y_min, x_max, y_max)
@@ -15,111 +36,132 @@ TextBlock = Dict[str, Any]  # Dictionary containing text, bbox, and metadata
 ImageSplit = Dict[str, Any]  # Dictionary containing image split information
 TranslatorDict = Dict[str, Any]  # Dictionary containing translator type and client
 
+# From this many boxes on, deduplication only compares boxes that share a grid
+# cell instead of running the compiled all-pairs suppression
+SPATIAL_DEDUP_BOXES = 50000
 
-def boxes_close(
-    box1: BoundingBox,
-    box2: BoundingBox,
-    distance_threshold: float
-) -> bool:
-    """
-    Check if two bounding boxes overlap or are close to each other.
+# image_enhance factors (1.0 leaves the image unchanged)
+CONTRAST_FACTOR = 1.8
+SHARPNESS_FACTOR = 1.5
 
-    Args:
-        box1: Tuple of (x_min, y_min, x_max, y_max) for the first box
-        box2: Tuple of (x_min, y_min, x_max, y_max) for the second box
-        distance_threshold: Maximum distance to consider boxes as close
+# ITU-R 601-2 luma weights, as used by PIL's "L" conversion
+LUMA_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
 
-    Returns:
-        True if boxes overlap or are within the distance threshold
+# PIL's sharpness blend, image + (image - smooth) * (factor - 1), as a single
+# 3x3 kernel. SMOOTH is a 3x3 box with extra weight on the center, scaled by 1/13.
+SHARPEN_KERNEL = np.full((3, 3), -(SHARPNESS_FACTOR - 1) / 13, dtype=np.float32)
+SHARPEN_KERNEL[1, 1] = 1 + (SHARPNESS_FACTOR - 1) * 8 / 13
+
+# Number of translation requests in flight at once
+TRANSLATE_WORKERS = int(os.environ.get('TRANSLATE_WORKERS', '8'))
+
+# Entries kept in the OCR (crop hash -> text) and translation ((text, lang) -> text) caches
+OCR_CACHE_SIZE = int(os.environ.get('OCR_CACHE_SIZE', '2048'))
+TRANSLATION_CACHE_SIZE = int(os.environ.get('TRANSLATION_CACHE_SIZE', '4096'))
+
+# Canvas sizes that crops are padded up to, so the OCR model only sees a few shapes
+CROP_BUCKETS = (256, 384, 512, 768)
+
+
+class LRUCache:
+    """Thread-safe mapping that evicts the least recently used entry when full."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._data: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key (marking it as recently used), or default."""
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store value under key, evicting the oldest entry if the cache is full."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+class BoxBatch:
     """
-    x1_min, y1_min, x1_max, y1_max = box1
-    x2_min, y2_min, x2_max, y2_max = box2
+    Boxes as one (N, 4) coordinate array, with per-box metadata in a parallel list.
 
-    # Calculate overlapping area
-    x_overlap = max(0, min(x1_max, x2_max) - max(x1_min, x2_min))
-    y_overlap = max(0, min(y1_max, y2_max) - max(y1_min, y2_min))
+    The box helpers take and return batches, so a pipeline converts the
+    detector's boxes once and passes the same array from step to step.
+    """
 
-    # Return True if boxes already overlap
-    if x_overlap > 0 and y_overlap > 0:
-        return True
+    def __init__(self, coords: np.ndarray, meta: Optional[List[Any]] = None) -> None:
+        self.coords = np.asarray(coords, dtype=np.float64).reshape(-1, 4)
+        self.meta = list(meta) if meta is not None else [None] * len(self.coords)
+        if len(self.meta) != len(self.coords):
+            raise ValueError(f'Got {len(self.meta)} metadata entries for {len(self.coords)} boxes')
 
-    # Calculate distance if boxes don't overlap
-    # Horizontal distance
-    if x1_max < x2_min:
-        x_distance = x2_min - x1_max
-    elif x2_max < x1_min:
-        x_distance = x1_min - x2_max
-    else:
-        x_distance = 0
+    @classmethod
+    def from_objects(cls, bboxes: List[Any]) -> 'BoxBatch':
+        """Build a batch from objects with a .bbox attribute, keeping the objects as metadata."""
+        return cls(np.array([bbox.bbox for bbox in bboxes], dtype=np.float64), bboxes)
 
-    # Vertical distance
-    if y1_max < y2_min:
-        y_distance = y2_min - y1_max
-    elif y2_max < y1_min:
-        y_distance = y1_min - y2_max
-    else:
-        y_distance = 0
+    @classmethod
+    def from_blocks(cls, blocks: List[TextBlock]) -> 'BoxBatch':
+        """Build a batch from dictionaries with a 'bbox' key, keeping the dictionaries as metadata."""
+        return cls(np.array([block['bbox'] for block in blocks], dtype=np.float64), blocks)
 
-    # Consider boxes close if diagonal distance is below threshold
-    diagonal_distance = (x_distance ** 2 + y_distance ** 2) ** 0.5
-    return diagonal_distance <= distance_threshold
+    def __len__(self) -> int:
+        return len(self.coords)
+
+    def __getitem__(self, index: Any) -> 'BoxBatch':
+        """Select boxes by index, slice, index array or boolean mask, keeping metadata aligned."""
+        indices = np.atleast_1d(np.arange(len(self.coords))[index])
+        return BoxBatch(self.coords[indices], [self.meta[i] for i in indices.tolist()])
+
+
+# Recognized text by crop hash, and translations by (text, target_lang). Both
+# live until the server restarts; translations are keyed on the text so a new
+# target language reuses cached OCR output.
+ocr_cache = LRUCache(OCR_CACHE_SIZE)
+translation_cache = LRUCache(TRANSLATION_CACHE_SIZE)
+
+# Shared translator (created on first use) and the pool translations run on
+_translator: Optional[TranslatorDict] = None
+_translator_lock = threading.Lock()
+_translate_pool = ThreadPoolExecutor(max_workers=TRANSLATE_WORKERS)
 
 
 def merge_overlapping_boxes(
-    bboxes: List[Any],
+    bboxes: Union[List[Any], BoxBatch],
     distance_threshold: int = 10
-) -> List[List[float]]:
+) -> Union[List[List[float]], BoxBatch]:
     """
     Merge overlapping or nearby bounding boxes.
 
     Args:
-        bboxes: List of bounding box objects with .bbox attribute
+        bboxes: List of bounding box objects with .bbox attribute, or a BoxBatch
         distance_threshold: Maximum distance to consider boxes for merging (default: 10)
 
     Returns:
-        List of merged bounding boxes in [x_min, y_min, x_max, y_max] format
+        Merged bounding boxes in [x_min, y_min, x_max, y_max] format: a BoxBatch
+        (without metadata) for a BoxBatch input, otherwise a list
     """
+    if isinstance(bboxes, BoxBatch):
+        return BoxBatch(merge_boxes(bboxes.coords, float(distance_threshold))) if len(bboxes) else bboxes
+
     if not bboxes:
         return []
 
-    # Convert bbox list to [x_min, y_min, x_max, y_max] format
-    boxes = [bbox.bbox for bbox in bboxes]
-    merged = []
-    used = [False] * len(boxes)
-
-    for i in range(len(boxes)):
-        if used[i]:
-            continue
-
-        current_box = list(boxes[i])
-        used[i] = True
-        merged_any = True
-
-        # Keep merging until no more boxes can be merged
-        while merged_any:
-            merged_any = False
-            for j in range(len(boxes)):
-                if used[j]:
-                    continue
-
-                if boxes_close(current_box, boxes[j], distance_threshold):
-                    # Create minimum bounding box that contains both boxes
-                    current_box = [
-                        min(current_box[0], boxes[j][0]),  # x_min
-                        min(current_box[1], boxes[j][1]),  # y_min
-                        max(current_box[2], boxes[j][2]),  # x_max
-                        max(current_box[3], boxes[j][3])  # y_max
-                    ]
-                    used[j] = True
-                    merged_any = True
-
-        merged.append(current_box)
-
-    return merged
+    # Convert bbox list to an (N, 4) array of [x_min, y_min, x_max, y_max]
+    return merge_boxes(BoxBatch.from_objects(bboxes).coords, float(distance_threshold)).tolist()
 
 
 def split_large_image_with_overlap(
-    image: Image.Image,
+    image: Union[Image.Image, np.ndarray],
     max_size: int = 1500,
     overlap: int = 750
 ) -> List[ImageSplit]:
@@ -127,113 +169,362 @@ def split_large_image_with_overlap(
     Split a large image into a grid with overlapping regions.
 
     This is useful for processing large images that exceed model size limits
-    while maintaining continuity at boundaries.
+    while maintaining continuity at boundaries. The image is converted to an
+    array once and every split is a view into it, so no pixels are copied per
+    tile; wrap a split in Image.fromarray if a PIL image is needed.
 
     Args:
-        image: PIL Image object to split
+        image: PIL Image or (H, W[, C]) array to split
         max_size: Maximum dimension for each split (default: 1500)
         overlap: Overlap size between adjacent splits (default: 750)
 
     Returns:
         List of dictionaries containing:
-            - image: Cropped PIL Image
+            - image: Array view of the cropped region
             - offset: (x, y) offset in original image
             - grid: (row, col) position in grid
             - size: (width, height) of the cropped region
     """
-    width, height = image.size
+    arr = np.asarray(image)
+    height, width = arr.shape[:2]
 
     if width <= max_size and height <= max_size:
-        return [{'image': image, 'offset': (0, 0), 'grid': (0, 0)}]
+        return [{'image': arr, 'offset': (0, 0), 'grid': (0, 0)}]
+
+    x_starts, x_ends, y_starts, y_ends = _tile_grid(width, height, max_size, overlap)
+    cols, rows = len(x_starts), len(y_starts)
+
+    logger.debug('🔲 Splitting image: %dx%d grid (overlap: %dpx)', cols, rows, overlap)
+
+    return [
+        {
+            'image': arr[y_starts[row]:y_ends[row], x_starts[col]:x_ends[col]],
+            'offset': (x_starts[col], y_starts[row]),
+            'grid': (row, col),
+            'size': (x_ends[col] - x_starts[col], y_ends[row] - y_starts[row])
+        }
+        for row in range(rows)
+        for col in range(cols)
+    ]
+
+
+@lru_cache(maxsize=256)
+def _tile_grid(
+    width: int,
+    height: int,
+    max_size: int,
+    overlap: int
+) -> Tuple[Tuple[int, ...], Tuple[int, ...], Tuple[int, ...], Tuple[int, ...]]:
+    """
+    Compute the tile edges of split_large_image_with_overlap for one image size.
 
+    Pages of a chapter usually share a size, so the grid is cached and only
+    computed once per size.
+
+    Args:
+        width: Image width in pixels
+        height: Image height in pixels
+        max_size: Maximum dimension for each split
+        overlap: Overlap size between adjacent splits
+
+    Returns:
+        Tuple of (x_starts, x_ends, y_starts, y_ends), one entry per column or row
+    """
     stride = max_size - overlap
     cols = (width - overlap + stride - 1) // stride
     rows = (height - overlap + stride - 1) // stride
 
-    print(f'🔲 Splitting image: {cols}x{rows} grid (overlap: {overlap}px)')
+    # Tile edges per column and row, with the last ones moved back so they end
+    # at the image boundary
+    x_starts = np.arange(cols) * stride
+    y_starts = np.arange(rows) * stride
+    x_ends = np.minimum(x_starts + max_size, width)
+    y_ends = np.minimum(y_starts + max_size, height)
+    x_starts[-1:] = max(0, width - max_size)
+    y_starts[-1:] = max(0, height - max_size)
+
+    return (tuple(x_starts.tolist()), tuple(x_ends.tolist()),
+            tuple(y_starts.tolist()), tuple(y_ends.tolist()))
+
+
+def iou_one_to_many(
+    box: np.ndarray,
+    boxes: np.ndarray,
+    area: Optional[float] = None,
+    areas: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Calculate the IoU of one box against every row of a box array.
+
+    Args:
+        box: Array of [x_min, y_min, x_max, y_max]
+        boxes: (K, 4) array of [x_min, y_min, x_max, y_max]
+        area: Area of box, if already known
+        areas: (K,) areas of boxes, if already known
+
+    Returns:
+        (K,) array of IoU values
+    """
+    x_left = np.maximum(boxes[:, 0], box[0])
+    y_top = np.maximum(boxes[:, 1], box[1])
+    x_right = np.minimum(boxes[:, 2], box[2])
+    y_bottom = np.minimum(boxes[:, 3], box[3])
+
+    intersection = np.clip(x_right - x_left, 0, None) * np.clip(y_bottom - y_top, 0, None)
+    if area is None:
+        area = (box[2] - box[0]) * (box[3] - box[1])
+    if areas is None:
+        areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    union = area + areas - intersection
+
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+
+def _suppress_with_grid(
+    coords: np.ndarray,
+    areas: np.ndarray,
+    iou_threshold: float
+) -> np.ndarray:
+    """
+    Same result as suppress_boxes, testing each kept box only against boxes in its grid cells.
+
+    Cells are as large as the longest box side, so every box spans at most
+    2x2 cells and any two overlapping boxes share at least one cell.
+
+    Args:
+        coords: (N, 4) array of [x_min, y_min, x_max, y_max], largest first
+        areas: (N,) array of box areas, in the same order
+        iou_threshold: IoU above which a later box is a duplicate
+
+    Returns:
+        (N,) boolean keep mask
+    """
+    cell = max(float((coords[:, 2:] - coords[:, :2]).max()), 1.0)
+    first_cell = np.floor(coords[:, :2] / cell).astype(np.int64)
+    last_cell = np.floor(coords[:, 2:] / cell).astype(np.int64)
+
+    grid: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+    for i, (cx1, cy1, cx2, cy2) in enumerate(np.hstack([first_cell, last_cell]).tolist()):
+        for cx in range(cx1, cx2 + 1):
+            for cy in range(cy1, cy2 + 1):
+                grid[(cx, cy)].append(i)
+    cells = {key: np.array(members, dtype=np.intp) for key, members in grid.items()}
+
+    suppressed = np.zeros(len(coords), dtype=bool)
+    for i, (cx1, cy1, cx2, cy2) in enumerate(np.hstack([first_cell, last_cell]).tolist()):
+        if suppressed[i]:
+            continue
 
-    splits = []
-    for row in range(rows):
-        for col in range(cols):
-            x_start = col * stride
-            y_start = row * stride
-            x_end = min(x_start + max_size, width)
-            y_end = min(y_start + max_size, height)
+        neighbors = np.concatenate([
+            cells[(cx, cy)] for cx in range(cx1, cx2 + 1) for cy in range(cy1, cy2 + 1)
+        ])
+        # Only later boxes that are still alive can be suppressed by this one,
+        # and only if they are big enough for the IoU to reach the threshold
+        neighbors = np.unique(neighbors[neighbors > i])
+        neighbors = neighbors[~suppressed[neighbors] & (areas[neighbors] > areas[i] * iou_threshold)]
+        if neighbors.size:
+            iou = iou_one_to_many(coords[i], coords[neighbors], areas[i], areas[neighbors])
+            suppressed[neighbors[iou > iou_threshold]] = True
+
+    return ~suppressed
+
+
+def _suppress_components(
+    coords: np.ndarray,
+    areas: np.ndarray,
+    iou_threshold: float
+) -> np.ndarray:
+    """
+    Keep one box per group of transitively duplicated boxes.
 
-            # Adjust last column/row to align with image boundary
-            if col == cols - 1:
-                x_start = max(0, width - max_size)
-            if row == rows - 1:
-                y_start = max(0, height - max_size)
+    Unlike greedy suppression, a box that only duplicates an already
+    suppressed box is dropped too, since it lands in the same group.
 
-            cropped = image.crop((x_start, y_start, x_end, y_end))
+    Args:
+        coords: (N, 4) array of [x_min, y_min, x_max, y_max], largest first
+        areas: (N,) array of box areas, in the same order
+        iou_threshold: IoU above which two boxes are duplicates
 
-            splits.append({
-                'image': cropped,
-                'offset': (x_start, y_start),
-                'grid': (row, col),
-                'size': (x_end - x_start, y_end - y_start)
-            })
+    Returns:
+        (N,) boolean keep mask
+    """
+    first, second = iou_pairs(coords, areas, float(iou_threshold))
+    _, labels = union_find(len(coords), first, second)
 
-    return splits
+    # Boxes are sorted largest first, so the first box of each group is its largest
+    _, representatives = np.unique(labels, return_index=True)
+    keep = np.zeros(len(coords), dtype=bool)
+    keep[representatives] = True
+    return keep
 
 
 def remove_duplicate_boxes(
-    all_boxes: List[TextBlock],
-    iou_threshold: float = 0.7
-) -> List[TextBlock]:
+    all_boxes: Union[List[TextBlock], BoxBatch],
+    iou_threshold: float = 0.7,
+    transitive: bool = False
+) -> Union[List[TextBlock], BoxBatch]:
     """
     Remove duplicate bounding boxes in overlapping regions using IoU (Intersection over Union).
 
     Args:
-        all_boxes: List of dictionaries containing 'bbox' key with bounding box coordinates
+        all_boxes: List of dictionaries containing 'bbox' key with bounding box
+            coordinates, or a BoxBatch
         iou_threshold: IoU threshold for considering boxes as duplicates (default: 0.7)
+        transitive: Collapse whole chains of duplicates to their largest box,
+            finding duplicate pairs on all cores, instead of greedy
+            suppression (default: False)
 
     Returns:
-        List of unique bounding boxes after duplicate removal
+        Unique bounding boxes after duplicate removal, largest first, in the
+        same form as all_boxes
     """
-    if not all_boxes:
-        return []
+    if not len(all_boxes):
+        return all_boxes if isinstance(all_boxes, BoxBatch) else []
 
-    def calculate_iou(box1: BoundingBox, box2: BoundingBox) -> float:
-        """Calculate Intersection over Union (IoU) between two boxes."""
-        x1_min, y1_min, x1_max, y1_max = box1
-        x2_min, y2_min, x2_max, y2_max = box2
+    batch = all_boxes if isinstance(all_boxes, BoxBatch) else BoxBatch.from_blocks(all_boxes)
+    coords = batch.coords
+    areas = (coords[:, 2] - coords[:, 0]) * (coords[:, 3] - coords[:, 1])
 
-        x_left = max(x1_min, x2_min)
-        y_top = max(y1_min, y2_min)
-        x_right = min(x1_max, x2_max)
-        y_bottom = min(y1_max, y2_max)
+    # Sort boxes by area in descending order (keep larger boxes first)
+    order = np.argsort(-areas, kind='stable')
+    coords = coords[order]
+    areas = areas[order]
+
+    if transitive:
+        keep = _suppress_components(coords, areas, iou_threshold)
+    elif len(coords) >= SPATIAL_DEDUP_BOXES:
+        keep = _suppress_with_grid(coords, areas, iou_threshold)
+    else:
+        keep = suppress_boxes(coords, areas, float(iou_threshold))
 
-        if x_right < x_left or y_bottom < y_top:
-            return 0.0
+    kept = batch[order[keep]]
 
-        intersection = (x_right - x_left) * (y_bottom - y_top)
-        area1 = (x1_max - x1_min) * (y1_max - y1_min)
-        area2 = (x2_max - x2_min) * (y2_max - y2_min)
-        union = area1 + area2 - intersection
+    logger.debug('🔍 Deduplication: %d → %d (removed: %d)', len(all_boxes), len(kept), len(all_boxes) - len(kept))
+    return kept if isinstance(all_boxes, BoxBatch) else kept.meta
 
-        return intersection / union if union > 0 else 0
 
-    # Sort boxes by area in descending order (keep larger boxes first)
-    sorted_boxes = sorted(
-        all_boxes,
-        key=lambda b: (b['bbox'][2] - b['bbox'][0]) * (b['bbox'][3] - b['bbox'][1]),
-        reverse=True
-    )
-
-    kept = []
-    for box in sorted_boxes:
-        is_duplicate = False
-        for kept_box in kept:
-            if calculate_iou(box['bbox'], kept_box['bbox']) > iou_threshold:
-                is_duplicate = True
-                break
-        if not is_duplicate:
-            kept.append(box)
-
-    print(f'🔍 Deduplication: {len(all_boxes)} → {len(kept)} (removed: {len(all_boxes) - len(kept)})')
-    return kept
+def bucket_size(width: int, height: int) -> Tuple[int, int]:
+    """
+    Find the smallest bucket canvas that fits a crop.
+
+    Dimensions larger than the biggest bucket are rounded up to a multiple of it.
+
+    Args:
+        width: Crop width in pixels
+        height: Crop height in pixels
+
+    Returns:
+        Tuple of (bucket_width, bucket_height)
+    """
+    def fit(size: int) -> int:
+        for bucket in CROP_BUCKETS:
+            if size <= bucket:
+                return bucket
+        largest = CROP_BUCKETS[-1]
+        return -(-size // largest) * largest
+
+    return fit(width), fit(height)
+
+
+def crop_region(image: np.ndarray, box: BoundingBox) -> np.ndarray:
+    """
+    Copy a region of an image into its own contiguous array.
+
+    Args:
+        image: Page as an (H, W, C) uint8 array
+        box: Region as (x_min, y_min, x_max, y_max), cut at integer pixels
+
+    Returns:
+        (height, width, C) uint8 array
+    """
+    x1, y1, x2, y2 = (max(0, int(v)) for v in box)
+    return np.ascontiguousarray(image[y1:y2, x1:x2])
+
+
+def crop_to_bucket(image: np.ndarray, box: BoundingBox, fill: int = 255) -> np.ndarray:
+    """
+    Copy a region of an image onto the center of its bucket-sized canvas.
+
+    Slicing the page array gives a view, so the region is copied exactly once,
+    straight into the padded canvas. A constant fill is used instead of
+    reflect padding, which would mirror glyphs into the margin and get picked
+    up by the OCR model.
+
+    Args:
+        image: Page as an (H, W, C) uint8 array
+        box: Region as (x_min, y_min, x_max, y_max), cut at integer pixels
+        fill: Gray level of the padded margin (default: 255, white)
+
+    Returns:
+        (bucket_height, bucket_width, C) uint8 array
+    """
+    x1, y1, x2, y2 = (max(0, int(v)) for v in box)
+    region = image[y1:y2, x1:x2]
+    height, width = region.shape[:2]
+    bucket_width, bucket_height = bucket_size(width, height)
+
+    canvas = np.full((bucket_height, bucket_width) + region.shape[2:], fill, dtype=image.dtype)
+    top = (bucket_height - height) // 2
+    left = (bucket_width - width) // 2
+    canvas[top:top + height, left:left + width] = region
+    return canvas
+
+
+def decode_image(image_data: str) -> Image.Image:
+    """
+    Decode base64 image data into an RGB image.
+
+    JPEGs go through libjpeg-turbo when available and most other formats
+    through OpenCV, both decoding straight to RGB. JPEGs libjpeg-turbo
+    rejects go through OpenCV too; GIFs and anything OpenCV can't read fall
+    back to PIL.
+
+    Args:
+        image_data: Base64-encoded image, optionally as a data URL
+
+    Returns:
+        RGB PIL Image object
+    """
+    if ',' in image_data:
+        image_data = image_data.split(',', 1)[1]
+
+    image_bytes = pybase64.b64decode_as_bytearray(image_data)
+
+    # libjpeg-turbo can't convert some JPEGs (e.g. CMYK) to RGB; those fall
+    # through to the decoders below
+    if _turbo_jpeg is not None and image_bytes[:3] == b'\xff\xd8\xff':
+        try:
+            return Image.fromarray(_turbo_jpeg.decode(image_bytes, pixel_format=TJPF_RGB))
+        except OSError:
+            pass
+
+    # OpenCV's GIF reader is slower than PIL's. PIL ignores EXIF orientation,
+    # so OpenCV is told to as well.
+    if image_bytes[:4] != b'GIF8':
+        decoded = cv2.imdecode(
+            np.frombuffer(image_bytes, dtype=np.uint8),
+            cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION
+        )
+        if decoded is not None:
+            return Image.fromarray(cv2.cvtColor(decoded, cv2.COLOR_BGR2RGB))
+
+    image = Image.open(BytesIO(image_bytes))
+    return image if image.mode == 'RGB' else image.convert('RGB')
+
+
+def image_hash(image: np.ndarray) -> str:
+    """
+    Hash an image array's shape and pixel data.
+
+    Args:
+        image: Image as a NumPy array
+
+    Returns:
+        Hex digest identifying the image content
+    """
+    hasher = xxhash.xxh64(f'{image.dtype}:{image.shape}'.encode())
+    hasher.update(np.ascontiguousarray(image))
+    return hasher.hexdigest()
 
 
 def image_enhance(image: Image.Image) -> Image.Image:
@@ -241,6 +532,12 @@ def image_enhance(image: Image.Image) -> Image.Image:
     Enhance image quality for better OCR performance.
 
     Applies contrast and sharpness enhancements to improve text recognition.
+    Both steps follow PIL's ImageEnhance math but run as OpenCV uint8 ops
+    (a lookup table and one 3x3 filter) instead of building two intermediate
+    images.
+
+    An alpha channel is passed through unchanged, as PIL's enhancers do;
+    modes other than L, LA, RGB and RGBA are converted to RGB first.
 
     Args:
         image: PIL Image object to enhance
@@ -248,15 +545,32 @@ def image_enhance(image: Image.Image) -> Image.Image:
     Returns:
         Enhanced PIL Image object
     """
-    # Enhance contrast
-    enhancer = ImageEnhance.Contrast(image)
-    image = enhancer.enhance(1.8)
-
-    # Enhance sharpness
-    sharpness = ImageEnhance.Sharpness(image)
-    image = sharpness.enhance(1.5)
-
-    return image
+    if image.mode not in ('L', 'LA', 'RGB', 'RGBA'):
+        image = image.convert('RGB')
+
+    src = np.asarray(image)
+    alpha = None
+    if image.mode in ('LA', 'RGBA'):
+        alpha = src[..., -1]
+        src = np.ascontiguousarray(src[..., 0] if image.mode == 'LA' else src[..., :3])
+
+    # Enhance contrast: scale the distance from the mean gray level. There are
+    # only 256 input levels, so the result is looked up from a table.
+    gray = src.reshape(-1, 3) @ LUMA_WEIGHTS if src.ndim == 3 else src
+    mean = int(gray.mean(dtype=np.float64) + 0.5)
+    levels = np.arange(256, dtype=np.float32)
+    lut = np.clip(np.trunc(mean + CONTRAST_FACTOR * (levels - mean)), 0, 255).astype(np.uint8)
+    contrasted = cv2.LUT(src, lut)
+
+    # Enhance sharpness: push pixels away from a smoothed copy in one filter
+    # pass. Border pixels stay unsmoothed, as in PIL.
+    sharpened = cv2.filter2D(contrasted, -1, SHARPEN_KERNEL)
+    sharpened[[0, -1]] = contrasted[[0, -1]]
+    sharpened[:, [0, -1]] = contrasted[:, [0, -1]]
+
+    if alpha is not None:
+        return Image.fromarray(np.dstack([sharpened, alpha]))
+    return Image.fromarray(sharpened)
 
 
 def translate_text(
@@ -278,6 +592,10 @@ def translate_text(
     if not text or not text.strip():
         return text
 
+    cached = translation_cache.get((text, target_lang))
+    if cached is not None:
+        return cached
+
     if translator is None:
         translator = get_translator()
 
@@ -301,6 +619,7 @@ def translate_text(
         )
 
         translation = response.choices[0].message.content.strip()
+        translation_cache.put((text, target_lang), translation)
         return translation
 
     except Exception as e:
@@ -310,7 +629,54 @@ def translate_text(
         return text
 
 
+def translate_texts(
+    texts: List[str],
+    target_lang: str = "Korean",
+    translator: Optional[TranslatorDict] = None
+) -> List[str]:
+    """
+    Translate several texts concurrently over the shared API connection.
+
+    Args:
+        texts: Texts to translate
+        target_lang: Target language for translation (default: "Korean")
+        translator: Optional translator dictionary from get_translator()
+
+    Returns:
+        Translated texts in the same order as texts (originals where translation fails)
+    """
+    if translator is None:
+        translator = get_translator()
+
+    if translator is None:
+        print('⚠️  Translation skipped - API not available')
+        return list(texts)
+
+    return list(_translate_pool.map(
+        lambda text: translate_text(text, target_lang=target_lang, translator=translator),
+        texts
+    ))
+
+
 def get_translator() -> Optional[TranslatorDict]:
+    """
+    Get the shared translator, connecting on first use.
+
+    The connection is reused across requests; a failed connection is retried
+    on the next call so LM Studio can be started after the server.
+
+    Returns:
+        Dictionary containing translator type and client, or None if connection fails
+    """
+    global _translator
+
+    with _translator_lock:
+        if _translator is None:
+            _translator = _connect_translator()
+        return _translator
+
+
+def _connect_translator() -> Optional[TranslatorDict]:
     """
     Initialize and test connection to OpenAI API (LM Studio or actual OpenAI).
 
@@ -322,7 +688,8 @@ def get_translator() -> Optional[TranslatorDict]:
         # Use LM Studio's local server
         client = OpenAI(
             base_url="http://localhost:1234/v1",
-            api_key="lm-studio"  # LM Studio doesn't require a real API key
+            api_key="lm-studio",  # LM Studio doesn't require a real API key
+            timeout=60
         )
 
         # Test the connection